@@ -4,83 +4,223 @@ excel_service.py
 Lädt Sensordaten + exportiert LED/Sensor-Daten für GoLabel.
 """
 from __future__ import annotations
-import openpyxl, os
-from typing import Tuple, List
+import openpyxl, os, re, html, zipfile, queue, threading
+from typing import Tuple, List, Callable
 
 # ----------------------------------------------------------------------
 # Sensorliste laden (GUI)
 # ----------------------------------------------------------------------
-def load_sensor_data(path: str) -> Tuple[openpyxl.Workbook,
-                                         openpyxl.worksheet.worksheet.Worksheet,
-                                         List[tuple]]:
+def _read_sensors(ws) -> List[tuple]:
+    """Sensorzeilen (A..E, Zeile 2–61) des GAS-Blatts einlesen."""
+    sensors = []
+    # Spalten A..E in einem Durchlauf lesen (keine Einzelzell-Zugriffe)
+    rows = ws.iter_rows(min_row=2, max_row=61, min_col=1, max_col=5,
+                        values_only=True)
+    for row, (model, addr, location, buzzer, serial) in enumerate(rows, 2):
+        if addr:
+            sensors.append((row, model, location, addr, buzzer, serial))
+    return sensors
+
+
+def load_sensor_data(path: str) -> List[tuple]:
+    """
+    Nur-Lese-Variante für die Anzeige: Styles/Formeln werden nicht
+    materialisiert, die Datei wird sofort wieder freigegeben.
+    """
+    # kein keep_vba: es wird nie gespeichert, vbaProject.bin bleibt ungelesen
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        return _read_sensors(wb["GAS"])
+    finally:
+        wb.close()
+
+
+def open_sensor_workbook(path: str) -> Tuple[
+        openpyxl.Workbook, openpyxl.worksheet.worksheet.Worksheet]:
+    """Beschreibbares Workbook + GAS-Blatt – für die Konfiguration (Import!E)."""
     wb = openpyxl.load_workbook(
         path,
         data_only=True,
         keep_vba=os.path.splitext(path)[1].lower() == ".xlsm"
     )
-    ws = wb["GAS"]
-    sensors = []
-    for row in range(2, 62):
-        model = ws[f"A{row}"].value
-        location = ws[f"C{row}"].value
-        addr   = ws[f"B{row}"].value
-        buzzer = ws[f"D{row}"].value
-        serial = ws[f"E{row}"].value
-        if addr:
-            sensors.append((row, model, location, addr, buzzer, serial))
-    return wb, ws, sensors
+    return wb, wb["GAS"]
+
+
+def save_workbook_atomic(wb: openpyxl.Workbook, path: str) -> None:
+    """
+    Speichert über eine .tmp-Datei + os.replace – bei Absturz während des
+    Schreibens bleibt die bisherige Liste unversehrt.
+    """
+    tmp = path + ".tmp"
+    try:
+        wb.save(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+class WorkbookSaver:
+    """
+    Speichert Workbooks in einem Hintergrund-Thread (atomar).  Aufgestaute
+    Aufträge werden zusammengefasst – nur der jüngste wird geschrieben.
+    Zellzugriffe während eines laufenden save() über ``lock`` absichern.
+    ``log`` und ``on_error`` werden aus dem Saver-Thread aufgerufen – müssen
+    thread-sicher sein.  Ein fehlgeschlagener Auftrag bleibt in ``failed``,
+    bis retry() ihn neu einreiht oder der Aufrufer ihn verwirft (None).
+    """
+
+    def __init__(self, log: Callable[[str], None] = print,
+                 on_error: Callable[[Exception], None] | None = None):
+        self.lock = threading.Lock()
+        self._log = log
+        self._on_error = on_error
+        self.failed: Tuple[openpyxl.Workbook, str] | None = None
+        self._q: queue.Queue = queue.Queue()
+        threading.Thread(target=self._loop, name="ExcelSaver",
+                         daemon=True).start()
+
+    def put(self, wb: openpyxl.Workbook, path: str) -> None:
+        self._q.put((wb, path))
+
+    def idle(self) -> bool:
+        """True, wenn keine Speicherung mehr aussteht (nicht blockierend)."""
+        return self._q.unfinished_tasks == 0
+
+    def retry(self) -> None:
+        """Zuletzt fehlgeschlagenen Auftrag erneut einreihen."""
+        job, self.failed = self.failed, None
+        if job is not None:
+            self._q.put(job)
+
+    def _loop(self):
+        while True:
+            wb, path = self._q.get()
+            n = 1
+            try:
+                while True:
+                    wb, path = self._q.get_nowait()
+                    n += 1
+            except queue.Empty:
+                pass
+            try:
+                with self.lock:
+                    save_workbook_atomic(wb, path)
+                self.failed = None
+            except Exception as e:
+                self.failed = (wb, path)    # vor task_done → idle() sieht es
+                self._log(f"[ERROR] Excel-Save: {e}")
+                if self._on_error:
+                    self._on_error(e)
+            finally:
+                for _ in range(n):
+                    self._q.task_done()
 
 # ----------------------------------------------------------------------
 # LED-Daten kopieren (nur Slave-ID > 0)
 # ----------------------------------------------------------------------
-_LED_SHEETS = {
-    "LIGHTIMOK", "LIGHT", "Light",
-    "LEDIMOK", "LED", "Led", "Light 24V"
-}
+# Blattnamen normalisiert (strip + casefold) vergleichen
+_LED_SHEETS = frozenset({"lightimok", "light", "ledimok", "led", "light 24v"})
+
+# Blattname der GoLabel-Datenquelle (SELECT * from `ImportGodex$`)
+GODEX_SHEET = "ImportGodex"
+
+def _new_godex_workbook() -> Tuple[openpyxl.Workbook, object]:
+    """Frisches write-only Workbook mit dem von GoLabel erwarteten Blatt."""
+    dwb = openpyxl.Workbook(write_only=True)
+    return dwb, dwb.create_sheet(GODEX_SHEET)
+
+_SHEET_NAME_RE = re.compile(
+    r"""<(?:[\w.-]+:)?sheet\b[^>]*?\sname\s*=\s*(["'])(.*?)\1""")
+
 
-def copy_led_data(src: str, dst: str) -> bool:
+def _xlsx_sheet_names(path: str) -> List[str] | None:
+    """
+    Blattnamen direkt aus xl/workbook.xml lesen – ohne sharedStrings/Styles
+    zu parsen.  None, wenn unbekannt (kein xlsx/xlsm-Archiv, nicht
+    dekodierbar oder kein <sheet> erkannt) – dann entscheidet openpyxl.
+    """
+    try:
+        with zipfile.ZipFile(path) as z:
+            wbxml = z.read("xl/workbook.xml").decode("utf-8")
+    except (OSError, KeyError, zipfile.BadZipFile, UnicodeDecodeError):
+        return None
+    # <sheet> auch mit Namespace-Präfix (<x:sheet>) und '…'-Attributen
+    names = [html.unescape(m.group(2)) for m in _SHEET_NAME_RE.finditer(wbxml)]
+    return names or None
+
+
+def _find_led_sheet(names: List[str]) -> str | None:
+    return next((n for n in names if n.strip().casefold() in _LED_SHEETS),
+                None)
+
+
+def has_led_sheet(path: str) -> bool:
+    """
+    Vorab-Prüfung im ZIP, ob die Liste ein LIGHT/LED-Blatt hat – ohne das
+    Workbook zu laden.  Im Zweifel (kein xlsx-Archiv) True.
+    """
+    names = _xlsx_sheet_names(path)
+    return names is None or _find_led_sheet(names) is not None
+
+
+def _open_source(src: str | openpyxl.Workbook
+                 ) -> Tuple[openpyxl.Workbook, bool]:
+    """Pfad → eigenes read-only Workbook (True = selbst schließen)."""
+    if isinstance(src, openpyxl.Workbook):
+        return src, False
+    return openpyxl.load_workbook(src, read_only=True, data_only=True), True
+
+
+def copy_led_data(src: str | openpyxl.Workbook, dst: str) -> bool:
     """
     Kopiert alle Zeilen mit Slave-ID > 0 aus dem LED-Blatt in die
     PowerAutomate-Vorlage.  Rückgabe True, wenn mind. eine Zeile kopiert wurde.
+    src: Pfad oder bereits geöffnetes read-only Workbook.
     """
     try:
-        # Quelle
-        swb = openpyxl.load_workbook(src, read_only=True, data_only=True)
-        src_sheet = next(
-            (swb[name] for name in swb.sheetnames
-             if name.strip() in _LED_SHEETS),
-            None
-        )
-        if src_sheet is None:
+        # LED-Blatt vorab im ZIP suchen – fehlt es, gar nicht erst laden
+        if isinstance(src, str) and not has_led_sheet(src):
             print("[LED-Copy] Kein LIGHT/LED-Blatt gefunden."); return False
 
-        # Ziel vorbereiten
-        if not os.path.exists(dst):
-            openpyxl.Workbook().save(dst)        # leere Datei anlegen
-        dwb = openpyxl.load_workbook(dst)
-        d = dwb.active
-        d.delete_rows(1, d.max_row)
-        d.delete_cols(1, d.max_column)
-
-        # Header kopieren
-        d.append([c.value for c in src_sheet[1]])
-
-        # Daten
-        dest_row = 2
-        for row_vals in src_sheet.iter_rows(min_row=2, values_only=True):
-            sid = row_vals[1]
-            try:
-                sid_int = int(sid)
-            except (TypeError, ValueError):
-                continue
-            if sid_int > 0:
-                for col, val in enumerate(row_vals, 1):
-                    if val is not None:
-                        d.cell(dest_row, col).value = val
-                dest_row += 1
+        # Quelle (read-only, zeilenweise gestreamt)
+        swb, owned = _open_source(src)
+        try:
+            led_name = _find_led_sheet(swb.sheetnames)
+            if led_name is None:
+                print("[LED-Copy] Kein LIGHT/LED-Blatt gefunden."); return False
+            src_sheet = swb[led_name]
+
+            # Ziel: neues write-only Workbook (ersetzt die alte Datei)
+            dwb, d = _new_godex_workbook()
+
+            # Header + Daten in einem Durchlauf über das Quellblatt
+            rows = src_sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return False
+            d.append(list(header))
+
+            count = 0
+            for row_vals in rows:
+                sid = row_vals[1]
+                # Zahl (Normalfall) ohne try/except; >= 1 ≙ int(sid) > 0
+                if isinstance(sid, (int, float)):
+                    if sid < 1:
+                        continue
+                elif isinstance(sid, str):
+                    sid = sid.strip()
+                    if not (sid.isdecimal() and int(sid) > 0):
+                        continue
+                else:
+                    continue
+                d.append(list(row_vals))
+                count += 1
+        finally:
+            if owned:
+                swb.close()
 
         dwb.save(dst)
-        return dest_row > 2               # True, wenn mind. 1 Zeile kopiert
+        return count > 0                  # True, wenn mind. 1 Zeile kopiert
 
     except Exception as e:
         print("[LED-Copy] Fehler:", e)
@@ -89,22 +229,22 @@ def copy_led_data(src: str, dst: str) -> bool:
 # ----------------------------------------------------------------------
 # Sensor-Daten kopieren (unverändert)
 # ----------------------------------------------------------------------
-def copy_sensor_data(src: str, dst: str) -> bool:
+def copy_sensor_data(src: str | openpyxl.Workbook, dst: str) -> bool:
     """
     Kopiert das GAS-Blatt 1:1 in die PowerAutomate-Sensorvorlage.
+    src: Pfad oder bereits geöffnetes read-only Workbook.
     """
     try:
-        swb = openpyxl.load_workbook(src, read_only=True, data_only=True)
-        s = swb["GAS"]
-        dwb = openpyxl.load_workbook(dst)
-        d = dwb.active
-        d.delete_rows(1, d.max_row)
-        d.delete_cols(1, d.max_column)
-
-        for r, row in enumerate(s.iter_rows(min_row=2, values_only=True), 1):
-            for c, val in enumerate(row, 1):
-                if val is not None:
-                    d.cell(r, c).value = val
+        swb, owned = _open_source(src)
+        try:
+            s = swb["GAS"]
+            dwb, d = _new_godex_workbook()
+
+            for row in s.iter_rows(min_row=2, values_only=True):
+                d.append(row)
+        finally:
+            if owned:
+                swb.close()
         dwb.save(dst)
         return True
     except Exception as e:
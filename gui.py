@@ -13,11 +13,12 @@ from __future__ import annotations
 import tkinter as tk, sys
 from tkinter import ttk, scrolledtext, messagebox
 import tkinter.font as tkFont
-import threading, time, serial.tools.list_ports, pathlib
+import threading, queue, time, serial.tools.list_ports, pathlib
 
 from serial_manager import SerialManager
 from project_context import ProjectContext
-from excel_service import load_sensor_data
+from excel_service import (load_sensor_data, open_sensor_workbook,
+                           WorkbookSaver)
 from label_printer import print_led_labels, print_sensor_labels
 
 # ------------------------------------------------------------------ #
@@ -25,11 +26,44 @@ CTX  = ProjectContext()
 SER  = SerialManager()              # ggf. log_cb=self._log später setzen
 STOP = threading.Event()
 SKIP = threading.Event()
+POLL_STEP = 0.2                     # s zwischen zwei Abfragen @1
+PROBE_TIMEOUT = 0.2                 # Lese-Timeout beim Suchen @1 (statt 1 s)
+_PRINT_STATUS = "GoLabel druckt …"   # Statustext während des Drucks
+
+# ------------------------------------------------------------------ #
+class SensorRow:
+    """Eine Sensorzeile der Tabelle – Excel-Daten + Auswahlzustand."""
+    __slots__ = ("iid", "index", "row", "model", "loc", "addr",
+                 "buzzer", "serial", "selected")
+
+    def __init__(self, iid: str, index: int, row: int, model, loc, addr,
+                 buzzer, serial=None, selected: bool = True):
+        self.iid      = iid
+        self.index    = index          # laufende Nr. (Spalte „Index“)
+        self.row      = row            # Zeile im Excel
+        self.model    = model
+        self.loc      = loc
+        self.addr     = addr
+        self.buzzer   = buzzer         # Rohwert aus Spalte D
+        self.serial   = serial
+        self.selected = selected
+
+    @property
+    def disable_bz(self) -> bool:
+        return self.buzzer == "Buzzer Disable"
+
+    def values(self, sn="", status="Pending") -> tuple:
+        """Werte für alle Treeview-Spalten (COLS)."""
+        return ("☑" if self.selected else "☐", self.index, self.model,
+                self.loc, self.addr,
+                "Disable" if self.disable_bz else "Enable", sn, status)
+
 
 # ------------------------------------------------------------------ #
 class SensorGUI(tk.Tk):
     
     COLS = ("Sel", "Index", "Model", "Location", "Address", "Buzzer", "Serial", "Status")
+    SAVE_EVERY = 10                 # Zwischenspeichern alle K Sensoren
 
     # ------------------------ Init ------------------------------------ #
     def __init__(self):
@@ -47,8 +81,23 @@ class SensorGUI(tk.Tk):
             try: self.iconbitmap(ico)
             except Exception: pass
 
-        self._selected: dict[str, bool] = {}
+        self._rows: list[SensorRow] = []              # Tabelle in Anzeigereihenfolge
+        self._iid_to_idx: dict[str, int] = {}         # Treeview-iid → _rows-Index
+        # Register 255 je Modell (Annahme: nur Bit 9 = Buzzer ist variabel)
+        self._buzzer_cache: dict[str, int] = {}
+
+        # Excel-Speichern im Hintergrund (Worker blockiert nicht)
+        # Meldungen aus Hintergrund-Threads ohne Tk-Zugriff → _drain_msgs
+        self._msg_q: queue.Queue = queue.Queue()
+        self._saver = WorkbookSaver(log=self._msg_q.put,
+                                    on_error=self._on_save_error)
+        self._save_failed = threading.Event()   # → Rückfrage in _drain_msgs
+        self._worker_thread: threading.Thread | None = None
+        self._closing = False
+        self._prints_running = 0            # laufende GoLabel-Prozesse
+
         self._build_ui()
+        self._drain_msgs()
 
     # ------------------------ GUI-Aufbau ------------------------------ #
     def _build_ui(self):
@@ -61,9 +110,11 @@ class SensorGUI(tk.Tk):
 
         prn_m = tk.Menu(menu, tearoff=0)
         prn_m.add_command(label="LED-Labels",
-                          command=lambda: print_led_labels(CTX, self, self._log))
+                          command=lambda: print_led_labels(
+                              CTX, self, self._log, self._print_busy))
         prn_m.add_command(label="Sensor-Labels",
-                          command=lambda: print_sensor_labels(CTX, self, self._log))
+                          command=lambda: print_sensor_labels(
+                              CTX, self, self._log, self._print_busy))
         menu.add_cascade(label="Print", menu=prn_m)
 
         help_m = tk.Menu(menu, tearoff=0)
@@ -133,6 +184,58 @@ class SensorGUI(tk.Tk):
         self.log.insert(tk.END, f"{time.strftime('%H:%M:%S')}: {msg}\n")
         self.log.see(tk.END)
 
+    def _print_busy(self, running: bool):
+        """
+        Statusleiste während GoLabel läuft.  Zähler für überlappende Drucke;
+        alter Stand erst nach dem letzten zurück – und nur, wenn die
+        Konfiguration den Status inzwischen nicht selbst gesetzt hat.
+        """
+        if running:
+            if self._prints_running == 0:
+                self._status_before = (self.lab_status.cget("text"),
+                                       self.lab_status.cget("background"))
+            self._prints_running += 1
+            self.lab_status.config(text=_PRINT_STATUS, background="yellow")
+            return
+        self._prints_running = max(0, self._prints_running - 1)
+        if (self._prints_running == 0
+                and self.lab_status.cget("text") == _PRINT_STATUS):
+            text, bg = self._status_before
+            self.lab_status.config(text=text, background=bg)
+
+    def _drain_msgs(self):
+        """Meldungen der Hintergrund-Threads im Tk-Thread ins Log schreiben."""
+        try:
+            while True:
+                self._log(self._msg_q.get_nowait())
+        except queue.Empty:
+            pass
+        self._drain_id = self.after(100, self._drain_msgs)
+        if self._save_failed.is_set():
+            self._save_failed.clear()
+            self._ask_save_retry()
+
+    def _on_save_error(self, e: Exception):
+        """Saver-Thread: Lauf anhalten – ohne Speichern keine weiteren Sensoren."""
+        STOP.set()
+        self._save_failed.set()
+
+    def _ask_save_retry(self):
+        """Fehlgeschlagene Speicherung melden; wiederholen oder verwerfen."""
+        self.lab_status.config(text="Speicherfehler – Serien-Nr. nicht in Excel",
+                               background="red")
+        if messagebox.askretrycancel(
+                "Excel-Liste nicht gespeichert",
+                "Die Serien-Nr. konnten nicht in die Excel-Liste geschrieben "
+                "werden – ist die Datei noch in Excel geöffnet?\n\n"
+                "Die Konfiguration wurde angehalten.  Datei schließen und "
+                "„Wiederholen“ wählen.",
+                parent=self):
+            self._saver.retry()
+        else:
+            self._saver.failed = None
+            self._log("[ERROR] Ungespeicherte Serien-Nr. verworfen.")
+
     # ---------- COM-Port --------------------------------------------- #
     def _refresh_ports(self):
         """Aktualisiert die Liste der verfügbaren COM-Ports und versucht, eine Verbindung herzustellen."""
@@ -182,12 +285,15 @@ class SensorGUI(tk.Tk):
             return
 
         CTX.nr, CTX.xlsx = int(nr), None
+        # Tabelle der alten Anlage verwerfen – Start darf nie alte Zeilen
+        # in die neue Liste schreiben, auch wenn das Laden scheitert
+        self._clear_table()
         if not CTX.ensure_loaded(self):
             return
 
         # Excel öffnen – Sperre abfangen
         try:
-            wb, ws, sensors = load_sensor_data(CTX.xlsx)
+            sensors = load_sensor_data(CTX.xlsx)
         except PermissionError:
             messagebox.showwarning(
                 "Excel-Datei gesperrt",
@@ -206,29 +312,33 @@ class SensorGUI(tk.Tk):
             return
 
         # Tabelle füllen
-        self.tree.delete(*self.tree.get_children())
-        self._selected.clear()
-
-        for i, (_, model, loc, addr, buzzer, _sn) in enumerate(sensors, 1):
-            buz = "Disable" if buzzer == "Buzzer Disable" else "Enable"
-            iid = self.tree.insert(
-                "", "end",
-                values=("☑", i, model, loc, addr, buz, "", "Pending"),
-                tags=()
-            )
-            self._selected[iid] = True
+        for i, (row, model, loc, addr, buzzer, sn) in enumerate(sensors, 1):
+            r = SensorRow("", i, row, model, loc, addr, buzzer, sn)
+            r.iid = self.tree.insert("", "end", values=r.values(), tags=())
+            self._iid_to_idx[r.iid] = len(self._rows)
+            self._rows.append(r)
 
         self.lab_current.config(text=f"Current Anlage: {CTX.nr}")
         self._log(f"Excel geladen – {len(sensors)} Sensoren.")
 
+    def _clear_table(self):
+        self.tree.delete(*self.tree.get_children())
+        self._rows.clear()
+        self._iid_to_idx.clear()
+        self.lab_current.config(text="Current Anlage: –")
+
+    def _set_result(self, r: SensorRow, status: str, sn="", tags=()):
+        """Serial/Status + Farbe mit einem einzigen Tcl-Aufruf setzen."""
+        self.tree.item(r.iid, values=r.values(sn, status), tags=tags)
+
     # ---------- Checkbox-Toggle -------------------------------------- #
     def _on_tree_click(self, event):
         if self.tree.identify_column(event.x) != "#1": return
         iid = self.tree.identify_row(event.y)
         if iid:
-            sel = not self._selected[iid]
-            self._selected[iid] = sel
-            self.tree.set(iid, "Sel", "☑" if sel else "☐")
+            r = self._rows[self._iid_to_idx[iid]]
+            r.selected = not r.selected
+            self.tree.set(iid, "Sel", "☑" if r.selected else "☐")
 
     # ---------- Start / Stop / Skip ---------------------------------- #
     def _start_cfg(self):
@@ -236,18 +346,27 @@ class SensorGUI(tk.Tk):
             messagebox.showinfo("Info", "Bitte zuerst Anlage laden (OK)."); return
         if not SER.port:
             messagebox.showerror("Fehler", "Kein COM-Port verbunden."); return
+        if self._busy_saving():
+            # sonst lädt der neue Lauf die Liste ohne die letzten Serien-Nr.
+            messagebox.showinfo("Info", "Der vorige Lauf speichert noch – "
+                                "bitte kurz warten."); return
 
-        wb, ws, all_sensors = load_sensor_data(CTX.xlsx)
-        ids = [iid for iid in self.tree.get_children() if self._selected[iid]]
-        sensors = [all_sensors[int(self.tree.set(iid, "Index")) - 1] for iid in ids]
+        rows = [r for r in self._rows if r.selected]
 
-        if not sensors:
+        if not rows:
             messagebox.showinfo("Info", "Keine Sensoren ausgewählt."); return
 
+        CTX.invalidate()                    # Worker schreibt die Liste
+        path = CTX.xlsx                     # fest für diesen Lauf
+        wb, ws = open_sensor_workbook(path)
+
         STOP.clear(); SKIP.clear()
+        self._buzzer_cache.clear()
         self.btn_start.config(state="disabled"); self.btn_skip.config(state="normal")
-        threading.Thread(target=self._worker,
-                         args=(wb, ws, sensors, ids), daemon=True).start()
+        self._worker_thread = threading.Thread(target=self._worker,
+                                               args=(wb, ws, rows, path),
+                                               daemon=True)
+        self._worker_thread.start()
 
     def _stop_cfg(self):
         STOP.set(); SKIP.set()
@@ -255,12 +374,14 @@ class SensorGUI(tk.Tk):
         self._log("Konfiguration gestoppt.")
 
     # ---------- Worker-Thread ---------------------------------------- #
-    def _worker(self, wb, ws, sensors, ids):
+    def _worker(self, wb, ws, rows: list[SensorRow], path: str):
         prev_iid = None
+        dirty = 0                       # ungespeicherte Serien-Nr.
         try:
             self.lab_status.config(text="Läuft …", background="yellow")
 
-            for (row, model, loc, addr, buzzer, _), iid in zip(sensors, ids):
+            for r in rows:
+                iid = r.iid
                 if STOP.is_set():
                     break
 
@@ -273,68 +394,82 @@ class SensorGUI(tk.Tk):
                 # Skip?
                 if SKIP.is_set():
                     SKIP.clear()
-                    self.tree.set(iid, "Status", "Skipped")
-                    self.tree.item(iid, tags=())
-                    self._log(f"Sensor {row-1} übersprungen.")
+                    self._set_result(r, "Skipped")
+                    self._log(f"Sensor {r.row-1} übersprungen.")
                     continue
 
                 # Auf Sensor @1 warten
-                if not self._wait_for_device_one():
-                    self.tree.set(iid, "Status", "Skipped")
-                    self.tree.item(iid, tags=())
+                serial = self._wait_for_device_one()
+                if serial is None:
+                    self._set_result(r, "Skipped")
                     continue
 
                 # Konfigurieren (ohne Boot-Wait / Poll)
-                sn = self._configure_single(ws, row, addr,
-                                            buzzer == "Buzzer Disable")
+                sn = self._configure_single(ws, r.row, r.model, r.addr,
+                                            r.disable_bz, serial)
 
                 # Ergebnis sofort anzeigen
                 if sn is not None:
-                    self.tree.set(iid, "Serial", sn)
-                    self.tree.set(iid, "Status", "OK")
-                    self.tree.item(iid, tags=("ok",))
-                    wb.save(CTX.xlsx)
+                    r.serial = sn
+                    self._set_result(r, "OK", sn, ("ok",))
+                    dirty += 1
+                    if dirty >= self.SAVE_EVERY:     # Checkpoint
+                        self._saver.put(wb, path)
+                        dirty = 0
                 else:
-                    self.tree.set(iid, "Status", "Fail")
-                    self.tree.item(iid, tags=("fail",))
+                    self._set_result(r, "Fail", tags=("fail",))
 
         except Exception as e:
             self._log(f"[ERROR] {e}")
 
         finally:
+            if dirty:
+                self._saver.put(wb, path)
             if prev_iid:
                 self.tree.item(prev_iid, tags=())
-            done = not STOP.is_set()
-            self.lab_status.config(text="Fertig" if done else "Abgebrochen",
-                                   background="lightgreen")
+            if self._saver.failed is not None or self._save_failed.is_set():
+                self.lab_status.config(text="Abgebrochen – Speicherfehler",
+                                       background="red")
+            else:
+                done = not STOP.is_set()
+                self.lab_status.config(text="Fertig" if done else "Abgebrochen",
+                                       background="lightgreen")
             self.btn_skip.config(state="disabled")
             self.btn_start.config(state="normal")
 
     # ---------- Gerät @1 suchen -------------------------------------- #
-    def _wait_for_device_one(self) -> bool:
+    def _wait_for_device_one(self) -> int | None:
+        """Wartet auf Gerät @1 und liefert dessen Serien-Nr. (None = Abbruch).
+
+        Register 2 und 3 (Serien-Nr.) kommen in einem Frame – die
+        Konfiguration muss die Serien-Nr. nicht erneut lesen.
+        """
         self._log("Suche Gerät @1 … (Skip überspringt; Stop beendet)")
         while not STOP.is_set():
             if SKIP.is_set():
                 SKIP.clear()
-                return False
+                return None
             try:
-                r = SER.read_holding(2, unit=1)
+                r = SER.read_holding(2, count=2, unit=1, timeout=PROBE_TIMEOUT)
                 if not r.isError():
-                    return True
+                    return r.registers[1]
             except Exception as e:
                 self._log(f"Modbus-Fehler (wait): {e}")
-            time.sleep(1)
-        return False
+            if STOP.wait(POLL_STEP):        # wacht bei Stop sofort auf
+                return None
+        return None
 
 
     # ---------- Einzel-Konfiguration ---------------------------------- #
     def _configure_single(self,
                         ws_gas,           # GAS-Sheet (nur gelesen)
                         row: int,         # Zeile im Excel
+                        model: str,
                         new_addr: int,
-                        disable_bz: bool) -> int | None:
+                        disable_bz: bool,
+                        serial: int) -> int | None:     # aus _wait_for_device_one
         """
-        • Serial @1 lesen → sofort GUI + Import!
+        • Serial @1 (bereits gelesen) → sofort GUI + Import!
         • Adresse/Buzzer schreiben
         • Reboot (17 ← 42330)
         • 2 s warten
@@ -345,22 +480,15 @@ class SensorGUI(tk.Tk):
             return None
 
         try:
-            # 1) Serien-Nr. lesen
-            res = SER.read_holding(3, unit=1)
-            if res.isError():
-                return None
-            serial = res.registers[0]
-
+            # 1) Serien-Nr. – kam bereits mit der Suche @1
             # **Serial sofort in GUI zeigen**  – Spalte „Serial“ wird
             # im Worker direkt nach Rückgabe gesetzt.
             # **Serial sofort in Blatt  Import  (Spalte E)**:
             wb       = ws_gas.parent
             ws_imp   = wb["Import"]
-            if row > ws_imp.max_row:                 # Zeile fehlt? ergänzen
-                while ws_imp.max_row < row - 1:
-                    ws_imp.append([None])
-                ws_imp.append([None, None, None, None, serial])
-            else:
+            # direkte Zelle – openpyxl erweitert das Blatt selbst
+            # (kein max_row-Scan / append-Auffüllen)
+            with self._saver.lock:                   # Saver-Thread schreibt evtl.
                 ws_imp.cell(row=row, column=5, value=serial)
 
             # 2) Adresse schreiben
@@ -368,22 +496,29 @@ class SensorGUI(tk.Tk):
                 return None
 
             # 3) Buzzer ggf. deaktivieren
+            #    Reg. 255 wird je Modell nur einmal gelesen; die übrigen
+            #    Bits gelten als modellkonstant, nur Bit 9 wird gelöscht.
             if disable_bz:
-                rr = SER.read_holding(255, unit=1)
-                if rr.isError():
-                    return None
-                SER.write_single(255, rr.registers[0] & ~(1 << 9), unit=1)
+                reg = self._buzzer_cache.get(model)
+                if reg is None:
+                    rr = SER.read_holding(255, unit=1)
+                    if rr.isError():
+                        return None
+                    reg = self._buzzer_cache[model] = rr.registers[0]
+                if SER.write_single(255, reg & ~(1 << 9), unit=1).isError():
+                    self._buzzer_cache.pop(model, None)
 
             # 4) Reboot
             if SER.write_single(17, 42330, unit=1).isError():
                 return None
 
-            # 5) feste Pause (Boot-Zeit) – 2 s
-            time.sleep(1.0)
+            # 5) feste Pause (Boot-Zeit) – bei Stop sofort weiter
+            STOP.wait(1.0)
 
             return serial                       # ⇒ Worker setzt Status = OK
 
         except Exception as e:
+            self._buzzer_cache.pop(model, None)
             self._log(f"Config-Fehler: {e}")
             return None
 
@@ -405,7 +540,30 @@ class SensorGUI(tk.Tk):
 
     # ---------- Cleanup ---------------------------------------------- #
     def _on_close(self):
-        STOP.set(); SKIP.set(); SER.close(); self.destroy()
+        if self._closing:
+            return
+        self._closing = True
+        STOP.set(); SKIP.set()
+        self.lab_status.config(text="Beenden – Serien-Nr. werden gespeichert …",
+                               background="yellow")
+        self._finish_close()
+
+    def _busy_saving(self) -> bool:
+        """Worker läuft noch, Speicherungen stehen aus oder sind
+        fehlgeschlagen (Rückfrage noch offen)."""
+        t = self._worker_thread
+        return ((t is not None and t.is_alive()) or not self._saver.idle()
+                or self._saver.failed is not None)
+
+    def _finish_close(self):
+        """Erst Worker (reiht letzte Speicherung ein), dann Saver abwarten –
+        per after()-Polling, damit der Tk-Thread nicht blockiert."""
+        if self._busy_saving():
+            self.after(100, self._finish_close)
+            return
+        SER.close()
+        self.after_cancel(self._drain_id)
+        self.destroy()
 
 
 # ------------------------------------------------------------------ #
@@ -6,43 +6,87 @@ Druckt LED- & Sensor-Etiketten über GoLabel II.
 from __future__ import annotations
 import subprocess
 import os
+from typing import Callable
 from tkinter import messagebox
 from project_context import ProjectContext
-from excel_service import copy_led_data, copy_sensor_data
+from excel_service import copy_led_data, copy_sensor_data, has_led_sheet
 
 DEST_FOLDER = r"C:\PowerAutomateArnDoNotDelete"
+GOLABEL_EXE = r"C:\Program Files (x86)\GoDEX\GoLabel II\GoLabel.exe"
+POLL_MS     = 200              # Abfrageintervall für das GoLabel-Ende
 
 
-def _run_godex(template: str, printer_ip: str) -> bool:
+def _run_godex(parent, template: str, printer_ip: str,
+               on_done: Callable[[bool], None]) -> None:
+    """
+    Startet GoLabel ohne den Tk-Mainloop zu blockieren; das Prozessende
+    wird per parent.after() abgefragt und an on_done(ok) gemeldet.
+    """
     try:
-        subprocess.run(
-            [r"C:\Program Files (x86)\GoDEX\GoLabel II\GoLabel.exe",
-             "-f", template, "-c", "2", "-i", printer_ip],
-            check=True)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+        proc = subprocess.Popen(
+            [GOLABEL_EXE, "-f", template, "-c", "2", "-i", printer_ip])
+    except OSError:
+        on_done(False); return
 
+    def _poll():
+        rc = proc.poll()
+        if rc is None:
+            parent.after(POLL_MS, _poll)
+        else:
+            on_done(rc == 0)
 
-def print_led_labels(ctx: ProjectContext, parent, log):
+    parent.after(POLL_MS, _poll)
+
+
+def _print(parent, log, busy, template: str, printer_ip: str, what: str):
+    if busy:
+        busy(True)
+
+    def _done(ok: bool):
+        if busy:
+            busy(False)
+        log(f"{what}-Etiketten gedruckt." if ok else f"Druckfehler ({what}).")
+
+    _run_godex(parent, template, printer_ip, _done)
+
+
+def _readonly_source(ctx: ProjectContext, log):
+    """Gemerktes read-only Workbook der Anlage-Liste (None bei Fehler)."""
+    try:
+        return ctx.open_readonly()
+    except Exception as e:
+        log(f"[ERROR] Excel-Load: {e}")
+        return None
+
+
+def print_led_labels(ctx: ProjectContext, parent, log,
+                     busy: Callable[[bool], None] | None = None):
     if not ctx.ensure_loaded(parent):
         log("Abgebrochen: keine Anlage gewählt."); return
+    # LED-Blatt vorab im ZIP suchen – fehlt es, gar nicht erst laden
+    if not has_led_sheet(ctx.xlsx):
+        log("Kein LIGHT/LED-Blatt in der Liste gefunden."); return
+    src = _readonly_source(ctx, log)
+    if src is None:
+        return
     dst = os.path.join(DEST_FOLDER, "PowerAutomateGodexLightDe.xlsx")
-    if copy_led_data(ctx.xlsx, dst):
+    if copy_led_data(src, dst):
         if messagebox.askyesno("Drucken", "LED-Etiketten drucken?", parent=parent):
-            ok = _run_godex(
-                template=os.path.join(DEST_FOLDER, "AutomaticLightDE.ezpx"),
-                printer_ip="10.1.40.88:9100")
-            log("LED-Etiketten gedruckt." if ok else "Druckfehler (LED).")
+            _print(parent, log, busy,
+                   template=os.path.join(DEST_FOLDER, "AutomaticLightDE.ezpx"),
+                   printer_ip="10.1.40.88:9100", what="LED")
 
 
-def print_sensor_labels(ctx: ProjectContext, parent, log):
+def print_sensor_labels(ctx: ProjectContext, parent, log,
+                        busy: Callable[[bool], None] | None = None):
     if not ctx.ensure_loaded(parent):
         log("Abgebrochen: keine Anlage gewählt."); return
+    src = _readonly_source(ctx, log)
+    if src is None:
+        return
     dst = os.path.join(DEST_FOLDER, "PowerAutomateGodexSensorDe.xlsx")
-    if copy_sensor_data(ctx.xlsx, dst):
+    if copy_sensor_data(src, dst):
         if messagebox.askyesno("Drucken", "Sensor-Etiketten drucken?", parent=parent):
-            ok = _run_godex(
-                template=os.path.join(DEST_FOLDER, "AutomaticSensorDE.ezpx"),
-                printer_ip="10.1.40.87:9100")
-            log("Sensor-Etiketten gedruckt." if ok else "Druckfehler (Sensor).")
+            _print(parent, log, busy,
+                   template=os.path.join(DEST_FOLDER, "AutomaticSensorDE.ezpx"),
+                   printer_ip="10.1.40.87:9100", what="Sensor")
@@ -4,7 +4,9 @@ project_context.py
 Hält Anlage-Nr. und Excel-Pfad zentral.
 """
 from __future__ import annotations
+import io
 import os
+import openpyxl
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 
@@ -13,6 +15,8 @@ class ProjectContext:
     def __init__(self):
         self.nr: int | None = None
         self.xlsx: str | None = None
+        self._ro_wb: openpyxl.Workbook | None = None
+        self._ro_key: tuple | None = None          # (Pfad, mtime, Größe)
 
     # ------------------------------------------------------------ #
     def ensure_loaded(self, parent) -> bool:
@@ -41,19 +45,55 @@ class ProjectContext:
                 self.xlsx = f
         return True
 
+    # ------------------------------------------------------------ #
+    def open_readonly(self) -> openpyxl.Workbook:
+        """
+        Read-only-Workbook von self.xlsx, einmal geparst und gemerkt.
+        Die Datei wird komplett in den Speicher gelesen – es bleibt kein
+        Handle offen, das Excel am Speichern hindert.  Ändert sich Pfad,
+        mtime oder Größe, wird neu geladen.
+        """
+        st = os.stat(self.xlsx)
+        key = (self.xlsx, st.st_mtime_ns, st.st_size)
+        if self._ro_wb is None or self._ro_key != key:
+            self.invalidate()
+            with open(self.xlsx, "rb") as f:
+                data = io.BytesIO(f.read())
+            self._ro_wb = openpyxl.load_workbook(
+                data, read_only=True, data_only=True)
+            self._ro_key = key
+        return self._ro_wb
+
+    def invalidate(self):
+        """Gemerktes Read-only-Workbook verwerfen (z. B. vor Schreibzugriff)."""
+        if self._ro_wb is not None:
+            self._ro_wb.close()
+        self._ro_wb = self._ro_key = None
+
 
 # ------------------------------------------------------------ #
+_PATH_CACHE: dict[int, str] = {}   # nur Treffer – fehlende Liste neu suchen
+
+
 def _find_excel_path(anlage_nr: int) -> str | None:
-    first_two = str(anlage_nr)[:2]
-    base = os.path.join(
-        r"T:\INOSENT_Projekte",
-        "20" + first_two,
-        str(anlage_nr),
-        f"{anlage_nr}_Anlageinfos",
-        f"DS_{anlage_nr}",
-    )
+    """
+    Sucht Liste_<nr>.xlsm/.xlsx/.xls auf T:.  Ein einziges listdir statt
+    drei exists-Abfragen (SMB-Roundtrips).  Gefundene Pfade werden pro
+    Sitzung gemerkt; None (Liste fehlt, T: nicht erreichbar) nicht.
+    """
+    path = _PATH_CACHE.get(anlage_nr)
+    if path is not None:
+        return path
+    nr = str(anlage_nr)
+    base = (rf"T:\INOSENT_Projekte\20{nr[:2]}\{nr}"
+            rf"\{nr}_Anlageinfos\DS_{nr}")
+    try:
+        names = {n.lower(): n for n in os.listdir(base)}
+    except OSError:
+        return None
     for ext in (".xlsm", ".xlsx", ".xls"):
-        p = os.path.join(base, f"Liste_{anlage_nr}{ext}")
-        if os.path.exists(p):
-            return p
+        name = names.get(f"liste_{nr}{ext}")
+        if name:
+            path = _PATH_CACHE[anlage_nr] = f"{base}\\{name}"
+            return path
     return None
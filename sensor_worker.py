@@ -4,19 +4,57 @@ sensor_worker.py – schnell & robust
 Ablauf pro Sensor
 
 1. Warten auf *neuen* Sensor @1   (Serial noch nicht gesehen)
-2. Serien-Nr. lesen  → sofort in Blatt „Import“ (Spalte E) schreiben
+2. Serien-Nr. lesen  → sofort in die Sidecar-CSV <liste>.serials.csv
+   (fsync, absturzsicher); Blatt „Import“ (Spalte E) wird am Ende gefüllt
 3. Adresse/Buzzer setzen, Reboot senden
-4. 2 s Pause, OK zurückgeben
+4. Auf Antwort unter neuer Adresse warten (max. 3 s), OK zurückgeben
+
+Die Excel-Liste wird erst am Ende einmal gespeichert.  Bleibt nach einem
+Absturz eine Sidecar-CSV liegen, übernimmt der nächste Lauf deren Werte.
 """
 
 from __future__ import annotations
+import csv
+import os
 import time
+import random
+import shutil
+import struct
 import openpyxl
 from typing import List, Dict, Callable
-from serial_manager import SerialManager
+from serial_manager import SerialManager, read_holding_frame
+from excel_service import save_workbook_atomic
+
+
+BOOT_PROBE_S   = 0.1       # erstes Probe-Intervall nach Reboot …
+BOOT_TIMEOUT_S = 3.0       # … verdoppelt, spätestens hier aufgeben
+POLL_MIN    = 0.05         # Start-Pollintervall @1 (s) …
+POLL_MAX    = 1.0          # … exponentiell verdoppelt bis max. 1 s
+PROBE_TIMEOUT = 0.2        # Lese-Timeout beim Suchen @1 (statt 1 s)
+
+_WAIT_MSG   = "Warte auf *neues* Gerät @1 …"
+_SERIAL_RESP_LEN = 7       # Adr, FC, Bytes, Reg (2), CRC (2)
+
+
+class SerialBitmap:
+    """
+    Menge bereits gesehener Serien-Nr. als Bitmap – Serien-Nr. sind
+    16-Bit-Registerwerte, also 1 Bit je möglichem Wert (8 KiB fest).
+    """
+    __slots__ = ("_bits",)
+
+    def __init__(self):
+        self._bits = bytearray(1 << 13)
+
+    def __contains__(self, serial: int) -> bool:
+        return bool(self._bits[serial >> 3] & (1 << (serial & 7)))
 
+    def add(self, serial: int) -> None:
+        self._bits[serial >> 3] |= 1 << (serial & 7)
 
-BOOT_WAIT_S = 2.0          # feste Boot-Pause nach Reboot
+    def update(self, serials) -> None:
+        for serial in serials:
+            self.add(serial)
 
 
 class SensorWorker:
@@ -24,6 +62,7 @@ class SensorWorker:
         self,
         rows: List[Dict],                           # Sensordaten (aus GAS)
         workbook: openpyxl.Workbook,               # gesamtes Workbook
+        path: str,                                 # Ziel für save()
         worksheet: openpyxl.worksheet.worksheet.Worksheet,  # GAS-Sheet
         ser: SerialManager,
         log: Callable[[str], None],
@@ -32,6 +71,7 @@ class SensorWorker:
     ):
         self.rows        = rows
         self.wb          = workbook
+        self.path        = path                    # Workbook kennt seinen Pfad nicht
         self.ws_gas      = worksheet               # bleibt zum Lesen erhalten
         self.ws_import   = workbook["Import"]      # Serien-Nr. hier speichern
 
@@ -39,48 +79,128 @@ class SensorWorker:
         self.log         = log
         self.stop_event  = stop_event
         self.skip_event  = skip_event
-        self.prev_serials: set[int] = set()
+        self.prev_serials = SerialBitmap()
+        self._probe_frame = read_holding_frame(3, unit=1)   # Serien-Nr. @1
+        # Reg. 255 mit gelöschtem Buzzer-Bit je Modell (item["model"]) –
+        # nach dem ersten RMW gemerkt (Annahme: übrige Bits modellkonstant)
+        self._bz_off_values: dict[str, int] = {}
+
+        # (Import-Zeile, Serien-Nr.) – erst vor dem Speichern nach Import!E
+        self._pending_serials: list[tuple[int, int]] = []
+        self._backup_done  = False
+
+        # (Import-Zeile, Serien-Nr.) je Sensor – bis zum Excel-Save
+        self._sidecar_path = self.path + ".serials.csv"
+        self._sidecar      = None
 
     # ------------------------------------------------------------------ #
     def run(self):
         self.log("Worker gestartet.")
-        for item in self.rows:
-            if not item["enabled"]:
-                self.log(f"Sensor {item['row']-1} übersprungen (deselektiert).")
-                continue
-            if self.stop_event.is_set():
-                break
+        self._replay_sidecar()
+        self._sidecar = open(self._sidecar_path, "a", newline="")
+        try:
+            for item in self.rows:
+                if not item["enabled"]:
+                    self.log(f"Sensor {item['row']-1} übersprungen (deselektiert).")
+                    continue
+                if self.stop_event.is_set():
+                    break
 
-            if not self._wait_for_addr1():
-                break
+                if not self._wait_for_addr1(item):
+                    break
 
-            ok, serial = self._configure(item)
-            item["status_cb"](ok)
+                ok, serial = self._configure(item)
+                item["status_cb"](ok)
 
-            if ok and serial:
-                self.prev_serials.add(serial)
-                self.wb.save(self.wb.filename)
+                if ok and serial:
+                    self.prev_serials.add(serial)
+        finally:
+            # einmaliges Speichern – auch bei Abbruch/Ctrl+C
+            self._sidecar.close()
+            try:
+                if self._pending_serials:
+                    self._flush_pending()
+                    self._save()
+                # Excel ist aktuell – Sidecar wird nicht mehr gebraucht
+                os.remove(self._sidecar_path)
+            except Exception as e:
+                self.log(f"Speicher-Fehler: {e}")
 
         self.log("Worker beendet.")
 
     # ------------------------------------------------------------------ #
-    def _wait_for_addr1(self) -> bool:
-        self.log("Warte auf *neues* Gerät @1 …")
+    def _replay_sidecar(self):
+        """Serien-Nr. eines abgebrochenen Laufs nach Import!E übernehmen."""
+        if not os.path.exists(self._sidecar_path):
+            return
+        entries, bad = [], 0
+        with open(self._sidecar_path, newline="") as f:
+            for line in f:
+                # nur vollständige Zeilen – eine abgerissene letzte Zeile
+                # („4,12“ statt „4,12345“) wäre sonst eine falsche Serien-Nr.
+                try:
+                    if not line.endswith("\n"):
+                        raise ValueError
+                    r, sn = map(int, line.rstrip("\r\n").split(","))
+                    if r < 1 or not 0 <= sn <= 0xFFFF:
+                        raise ValueError
+                except ValueError:      # leer/abgerissen/unplausibel
+                    bad += 1
+                    continue
+                entries.append((r, sn))
+        self._pending_serials.extend(entries)
+        self.prev_serials.update(sn for _, sn in entries)
+        self.log(f"{len(entries)} Serien-Nr. aus {self._sidecar_path} übernommen"
+                 + (f" ({bad} defekte Zeile(n) übersprungen)." if bad else "."))
+
+    def _record(self, import_row: int, serial: int):
+        """Serien-Nr. sofort dauerhaft in die Sidecar-CSV schreiben."""
+        csv.writer(self._sidecar).writerow([import_row, serial])
+        self._sidecar.flush()
+        os.fsync(self._sidecar.fileno())
+        self._pending_serials.append((import_row, serial))
+
+    def _flush_pending(self):
+        """Gesammelte Serien-Nr. in einem Rutsch nach Import!E schreiben."""
+        cell = self.ws_import.cell
+        for import_row, serial in self._pending_serials:
+            cell(row=import_row, column=5, value=serial)
+        self._pending_serials.clear()
+
+    def _save(self):
+        """Atomar speichern; vor dem ersten Überschreiben .bak anlegen."""
+        path = self.path
+        if not self._backup_done:
+            shutil.copy2(path, path + ".bak")
+            self._backup_done = True
+        save_workbook_atomic(self.wb, path)
+
+    # ------------------------------------------------------------------ #
+    def _wait_for_addr1(self, item: Dict) -> bool:
+        self.log(_WAIT_MSG)
+        raw_request, stop_wait = self.ser.raw_request, self.stop_event.wait
+        frame = self._probe_frame
+        delay = POLL_MIN                    # dicht pollen direkt nach Tausch
         while not self.stop_event.is_set():
             if self.skip_event.is_set():
                 self.skip_event.clear()
                 self.log("Warten abgebrochen (Skip).")
                 return False
             try:
-                res = self.ser.read_holding(3, unit=1)
-                if not res.isError():
-                    serial = res.registers[0]
+                # roher Poll ohne pymodbus-Overhead (None = keine Antwort)
+                resp = raw_request(frame, _SERIAL_RESP_LEN, timeout=PROBE_TIMEOUT)
+                if resp is not None:
+                    serial = struct.unpack(">H", resp[3:5])[0]
                     if serial not in self.prev_serials:
                         self.log(f"Gerät @1 gefunden (SN={serial}).")
+                        item["serial_cached"] = serial   # spart Read in _configure
                         return True
             except Exception as e:
                 self.log(f"Modbus-Fehler (wait): {e}")
-            time.sleep(1)
+            # Backoff + Jitter – weniger Frames auf dem RS-485-Bus
+            if stop_wait(delay + random.uniform(0, delay * 0.2)):
+                return False
+            delay = min(POLL_MAX, delay * 2)
         return False
 
     # ------------------------------------------------------------------ #
@@ -88,11 +208,12 @@ class SensorWorker:
         """
         • Serial sofort in „Import“ schreiben + GUI-Callback
         • Adresse/Buzzer setzen, Reboot senden
-        • 2 s warten, OK zurück
+        • auf Antwort unter neuer Adresse warten, OK zurück
         """
         row, new_addr, disable_bz = (
             item["row"], item["new_addr"], item["buzzer"]
         )
+        model = item.get("model")           # ohne Modell: immer RMW
 
         if self.skip_event.is_set():
             self.skip_event.clear()
@@ -100,20 +221,17 @@ class SensorWorker:
 
         self.log(f"Config {row-1} → Adresse {new_addr}")
         try:
-            # 1) Serien-Nr. lesen (@1)
-            res = self.ser.read_holding(3, unit=1)
-            if res.isError():
-                raise RuntimeError(res)
-            serial = res.registers[0]
+            # 1) Serien-Nr. – bereits in _wait_for_addr1 gelesen
+            serial = item.pop("serial_cached", None)
+            if serial is None:
+                res = self.ser.read_holding(3, unit=1)
+                if res.isError():
+                    raise RuntimeError(res)
+                serial = res.registers[0]
 
-            # 1a) SOFORT in Import!E schreiben
+            # 1a) SOFORT in die Sidecar-CSV; Import!E folgt beim Speichern
             import_row = max(1, row - 1)
-            if import_row > self.ws_import.max_row:
-                while self.ws_import.max_row < import_row:
-                    self.ws_import.append([None])
-                self.ws_import.cell(row=import_row, column=5, value=serial)
-            else:
-                self.ws_import.cell(row=import_row, column=5, value=serial)
+            self._record(import_row, serial)
             item["serial"] = serial  # GUI zeigt Serial an
 
             # 2) Adresse setzen
@@ -122,19 +240,27 @@ class SensorWorker:
 
             # 3) Buzzer ggf. deaktivieren
             if disable_bz:
-                r = self.ser.read_holding(255, unit=1)
-                if r.isError():
-                    raise RuntimeError(r)
-                self.ser.write_single(
-                    255, r.registers[0] & ~(1 << 9), unit=1
-                )
+                bz_off = self._bz_off_values.get(model)
+                if bz_off is None:
+                    r = self.ser.read_holding(255, unit=1)
+                    if r.isError():
+                        raise RuntimeError(r)
+                    bz_off = r.registers[0] & ~(1 << 9)
+                    if model is not None:
+                        self._bz_off_values[model] = bz_off
+                if self.ser.write_single(255, bz_off, unit=1).isError():
+                    self._bz_off_values.pop(model, None)   # nächstes Mal RMW
 
             # 4) Reboot
             if self.ser.write_single(17, 42330, unit=1).isError():
                 raise RuntimeError("restart")
 
-            # 5) feste Pause → Sensor bootet
-            time.sleep(BOOT_WAIT_S)
+            # 5) Sensor bootet – pollen statt fester Pause
+            if self._wait_for_boot(new_addr, serial):
+                self.prev_serials.add(serial)
+            else:
+                self.log(f"Sensor {row-1}: keine Antwort @{new_addr} "
+                         f"nach {BOOT_TIMEOUT_S:.0f} s")
 
             self.log(f"Sensor {row-1} OK (SN={serial})")
             return True, serial
@@ -142,3 +268,30 @@ class SensorWorker:
         except Exception as e:
             self.log(f"Config-Fehler: {e}")
             return False, None
+
+    # ------------------------------------------------------------------ #
+    def _wait_for_boot(self, new_addr: int, serial: int) -> bool:
+        """
+        Nach dem Reboot Serien-Nr. unter der neuen Adresse abfragen
+        (0.1, 0.2, 0.4 … s) bis der Sensor antwortet oder BOOT_TIMEOUT_S
+        abgelaufen ist.  Jede Probe ist ein rohes Frame mit kurzem
+        Timeout (höchstens die Restzeit), ohne pymodbus-Retry.
+        """
+        frame = read_holding_frame(3, unit=new_addr)
+        deadline = time.monotonic() + BOOT_TIMEOUT_S
+        delay = BOOT_PROBE_S
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stop_event.wait(min(delay, remaining)):
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                resp = self.ser.raw_request(frame, _SERIAL_RESP_LEN,
+                                            timeout=min(PROBE_TIMEOUT, remaining))
+                if resp is not None and struct.unpack(">H", resp[3:5])[0] == serial:
+                    return True
+            except Exception:
+                pass                                # bootet noch
+            delay *= 2
@@ -4,13 +4,30 @@ mit automatischem Reconnect (Watch-Dog) und retries=0.
 """
 
 from __future__ import annotations
-import time
+import random
 import threading
+import time
 from typing import Callable
 from pymodbus.client import ModbusSerialClient
-from pymodbus.exceptions import ModbusIOException
+from pymodbus.exceptions import ConnectionException, ModbusIOException
 import serial  # Direktes Importieren von pyserial
 
+
+def crc16(data: bytes) -> bytes:
+    """Modbus-RTU-CRC (Polynom 0xA001), little-endian wie auf dem Draht."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc.to_bytes(2, "little")
+
+
+def read_holding_frame(addr: int, count: int = 1, unit: int = 1) -> bytes:
+    """Fertiges RTU-Request-Frame für Funktion 03 (inkl. CRC)."""
+    pdu = bytes((unit, 0x03)) + addr.to_bytes(2, "big") + count.to_bytes(2, "big")
+    return pdu + crc16(pdu)
+
 class SerialManager:
     def __init__(self, baudrate: int = 9600, log_cb: Callable[[str], None] | None = None, timeout: float = 1.0):
         self._baud = baudrate
@@ -20,6 +37,7 @@ class SerialManager:
         self._client: ModbusSerialClient | None = None
         self._port: str | None = None
         self._wd_stop = threading.Event()
+        self._wd_wake = threading.Event()   # _call weckt den Watchdog bei I/O-Fehler
         self._wd_thread = threading.Thread(
             target=self._watchdog, name="SerialWatchdog", daemon=True
         )
@@ -67,6 +85,7 @@ class SerialManager:
     def close(self):
         """Schließt die Verbindung und stoppt den Watchdog."""
         self._wd_stop.set()
+        self._wd_wake.set()
         with self._lock:
             if self._client:
                 self._client.close()
@@ -82,36 +101,118 @@ class SerialManager:
     def is_open(self):
         return self._client is not None and self._client.is_socket_open()
 
-    def read_holding(self, addr: int, count: int = 1, unit: int = 1):
-        return self._call(self._client.read_holding_registers, addr, count=count, slave=unit)
+    def read_holding(self, addr: int, count: int = 1, unit: int = 1, timeout: float | None = None):
+        return self._call(self._client.read_holding_registers, addr, count=count, slave=unit,
+                          timeout=timeout)
+
+    def write_single(self, addr: int, value: int, unit: int = 1, timeout: float | None = None):
+        return self._call(self._client.write_register, addr, value=value, slave=unit,
+                          timeout=timeout)
+
+    def raw_request(self, frame: bytes, expected_len: int, timeout: float | None = None) -> bytes | None:
+        """Vorgefertigtes RTU-Frame senden und die Antwort roh lesen.
+
+        Umgeht pymodbus (Transaktions-/Response-Objekte) für häufige,
+        einfache Polls.  None bei Timeout, Exception-Antwort, falscher
+        Byte-Anzahl oder CRC-Fehler.  Danach wird die RTU-Pause von
+        3,5 Zeichenzeiten eingehalten.
+        """
+        self._ensure_open()
+        if not self.is_open:
+            raise ConnectionException(f"Port {self._port} nicht verbunden")
+        sock = self._client.socket
+        if timeout is not None:
+            sock.timeout = timeout
+        try:
+            sock.reset_input_buffer()
+            sock.write(frame)
+            resp = sock.read(expected_len)
+        except serial.SerialException as e:
+            with self._lock:
+                if self._client:
+                    self._client.close()
+            self._wd_wake.set()
+            raise ConnectionException(str(e))
+        finally:
+            sock.timeout = self._timeout
+            time.sleep(3.5 * 11 / self._baud)   # Frame-Pause vor dem nächsten Request
+        if (len(resp) != expected_len or resp[:2] != frame[:2]
+                or resp[2] != expected_len - 5
+                or crc16(resp[:-2]) != resp[-2:]):
+            return None
+        return resp
 
-    def write_single(self, addr: int, value: int, unit: int = 1):
-        return self._call(self._client.write_register, addr, value=value, slave=unit)
+    def _call(self, fn, *args, timeout: float | None = None, **kw):
+        """Führt eine Modbus-Operation mit Retry aus.
 
-    def _call(self, fn, *args, **kw):
-        """Führt eine Modbus-Operation mit Retry aus."""
+        Keine Antwort / CRC-Fehler (ModbusIOException – von pymodbus
+        zurückgegeben oder geworfen) ist kein Verbindungsproblem: das
+        Fehlerobjekt geht ohne Retry an den Aufrufer (``isError()``).
+        Nur bei Verbindungs-/OS-Fehlern wird der Port neu aufgebaut und
+        einmal wiederholt; schlägt auch das fehl, wird geworfen.
+        Modbus-Exception-Antworten des Slaves gehen sofort an den Aufrufer.
+        ``timeout`` überschreibt den Lese-Timeout nur für diesen Aufruf
+        (z. B. kurze Polls auf abwesende Geräte).
+        """
         for attempt in (1, 2):
             self._ensure_open()
             try:
                 if not self.is_open:
-                    raise ModbusIOException(f"Port {self._port} nicht verbunden")
-                res = fn(*args, **kw)
-                return res
+                    raise ConnectionException(f"Port {self._port} nicht verbunden")
+                res = self._invoke(fn, args, kw, timeout)
             except ModbusIOException as e:
-                self._log(f"Serial I/O-Fehler bei {self._port} (Versuch {attempt}): {e}")
-                with self._lock:
-                    if self._client:
-                        self._client.close()
-                time.sleep(0.2)
-            except Exception as e:
-                self._log(f"Unerwarteter Fehler bei Modbus-Operation (Versuch {attempt}): {e}")
-                raise
-        raise ModbusIOException(f"Serial-Port {self._port} nach Retry nicht verfügbar")
+                return e
+            except (ConnectionException, serial.SerialException) as e:
+                err = e
+            else:
+                if isinstance(res, ConnectionException):
+                    err = res
+                else:
+                    return res
+            self._log(f"Serial-Verbindungsfehler bei {self._port} (Versuch {attempt}): {err}")
+            with self._lock:
+                if self._client:
+                    self._client.close()
+            self._wd_wake.set()
+            # Backoff 0.1 s, 0.2 s … + Jitter; close() bricht die Pause ab
+            self._wd_stop.wait(0.1 * 2 ** (attempt - 1) + random.uniform(0, 0.02))
+        raise ConnectionException(f"Serial-Port {self._port} nach Retry nicht verfügbar")
+
+    def _invoke(self, fn, args, kw, timeout: float | None):
+        """Ruft ``fn`` auf, optional mit kurzem Timeout nur für diesen Aufruf.
+
+        pymodbus wartet in ``recv`` (``_wait_for_data``) nicht auf den
+        pyserial-Timeout, sondern auf ``comm_params.timeout_connect`` –
+        daher wird beides gesetzt und danach zurückgesetzt.
+        """
+        if timeout is None:
+            return fn(*args, **kw)
+        params = self._client.comm_params
+        sock = self._client.socket
+        old_connect = params.timeout_connect
+        params.timeout_connect = timeout
+        sock.timeout = timeout
+        try:
+            return fn(*args, **kw)
+        finally:
+            params.timeout_connect = old_connect
+            if self._client.socket is sock:
+                sock.timeout = self._timeout
+
+    def _needs_reconnect(self) -> bool:
+        client = self._client
+        return client is not None and not client.is_socket_open() and self._port is not None
 
     def _ensure_open(self):
-        """Stellt sicher, dass der Port geöffnet ist."""
+        """Stellt sicher, dass der Port geöffnet ist.
+
+        Schneller Pfad ohne Lock (Port offen = Normalfall); nur für den
+        Reconnect wird gesperrt und unter dem Lock erneut geprüft.
+        """
+        if not self._needs_reconnect():
+            return
         with self._lock:
-            if self._client and not self._client.is_socket_open() and self._port:
+            if self._needs_reconnect():
                 self._log(f"Port {self._port} geschlossen – reconnect …")
                 try:
                     ok = self._client.connect()
@@ -122,9 +223,12 @@ class SerialManager:
     def _watchdog(self):
         """Überwacht die Verbindung und reconnectet bei Bedarf."""
         while not self._wd_stop.is_set():
-            time.sleep(5)
+            self._wd_wake.wait(5)           # alle 5 s oder sofort nach I/O-Fehler
+            self._wd_wake.clear()
+            if self._wd_stop.is_set() or not self._needs_reconnect():
+                continue
             with self._lock:
-                if self._client and not self._client.is_socket_open() and self._port:
+                if self._needs_reconnect():
                     self._log(f"Watch-Dog: Port {self._port} geschlossen – reconnect …")
                     try:
                         ok = self._client.connect()